@@ -1,55 +1,157 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html
-from dash.dependencies import Input, Output
-import plotly.express as px
+from dash.dependencies import Input, Output, State
 import pandas as pd
 import numpy as np
-import pycountry
-import geopandas as gpd
-import altair as alt
 import plotly.graph_objects as go
+from figure_encoding import compact_figure
+from selection import EMPTY_SELECTION, SelectionIndex, encode_rows
+from quantile_sketch import KLLSketch, QuantileCube
+from ingest import derive_columns, read_prepared
+from country_indicators import INDICATORS, METRICS, CountryIndicators, correlation_matrix, linear_regression
+
+# plotly.express (see _px()), pycountry and geopandas are imported lazily where
+# they are used, so starting a worker does not pay for them.
+
+DATA_PATH = '../data/Billionaires_Statistics_Updated_Countrycoded.csv'
+GEO_DIR = '../data/geo'  # Written by build_geo.py
+# Partitions written by ingest.py, read instead of DATA_PATH only when this is set
+PREPARED_DIR = os.environ.get('BILLIONAIRES_PREPARED_DIR')
+
+# Data prepared by init_data()
+df = None
+billionaires_count = None
+global_billionaire_count = None
+geo_df = None
+country_geojson = None
+merged = None
+selection_index = None
+quantile_cube = None
+country_indicators = None
+richest_person_global = None
+youngest_billionaire_global = None
+oldest_billionaire_global = None
+top_industry_global = None
+top_company_global = None
+
+# Quantile sketches of wealth and age per (country, citizenship, industry, gender) cell
+quantile_sketch_k = 200  # Sketch accuracy: rank error is roughly 1.7 / k
+quantile_dims = ['country', 'countryOfCitizenship', 'industries', 'gender']
+
+# Seconds spent in each step of init_data(), for profile_startup.py
+startup_timings = {}
+_init_lock = threading.Lock()
+
+
+def _px():
+    """plotly.express, imported on first use.
+
+    Importing it takes about 200 ms, so workers start without it and the
+    first request that draws a chart (the map on page load) pays that cost.
+    """
+    import plotly.express as px
+    return px
+
+
+@contextmanager
+def _timed(step):
+    start = time.perf_counter()
+    yield
+    startup_timings[step] = time.perf_counter() - start
+
+
+def load_geo(geo_dir=GEO_DIR):
+    """Country attributes and GeoJSON prepared offline by build_geo.py (built on first use if missing)."""
+    geojson_path = os.path.join(geo_dir, 'countries.geojson')
+    attributes_path = os.path.join(geo_dir, 'countries.csv')
+    if not (os.path.exists(geojson_path) and os.path.exists(attributes_path)):
+        import build_geo
+        build_geo.build(geo_dir=geo_dir)
+    with open(geojson_path) as f:
+        geojson = json.load(f)
+    return pd.read_csv(attributes_path, keep_default_na=False, na_values=['']), geojson
+
+
+def init_data(data_path=DATA_PATH, geo_dir=GEO_DIR, prepared_dir=PREPARED_DIR):
+    """Load the dataset and build everything the callbacks read. Safe to call more than once.
+
+    Reads the partitions prepared by ingest.py from ``prepared_dir`` if given
+    (rows rejected by ingest.py are then left out), and the raw CSV at
+    ``data_path`` otherwise.
+    """
+    global df, billionaires_count, global_billionaire_count, geo_df, country_geojson, merged
+    global selection_index, quantile_cube, country_indicators
+    global richest_person_global, youngest_billionaire_global, oldest_billionaire_global
+    global top_industry_global, top_company_global
+
+    with _init_lock:
+        if df is not None:
+            return
+
+        # Load dataset
+        with _timed('read dataset'):
+            if prepared_dir:
+                data = read_prepared(prepared_dir)
+                print(f"Loaded {len(data)} rows from prepared partitions in {prepared_dir}")
+            else:
+                data = pd.read_csv(data_path)
+                print(f"Loaded {len(data)} rows from {data_path}")
+
+        with _timed('country counts and map'):
+            # Group by country and count billionaires
+            billionaires_count = data.groupby('country').size().reset_index(name='billionaire_count')
 
-# Load dataset
-df = pd.read_csv('../data/Billionaires_Statistics_Updated_Countrycoded.csv')
+            # Calculate global billionaire count
+            global_billionaire_count = billionaires_count['billionaire_count'].sum()
 
-# Group by country and count billionaires
-billionaires_count = df.groupby('country').size().reset_index(name='billionaire_count')
+            # Country geometries, centroids and areas
+            geo_df, country_geojson = load_geo(geo_dir)
 
-# Calculate global billionaire count
-global_billionaire_count = billionaires_count['billionaire_count'].sum()
+            # Ensure the column names in geo_df match your ISO codes (assumed to be 'iso_code')
+            merged = geo_df.merge(billionaires_count, left_on='ISO_A3', right_on='country', how='left').fillna(0)
 
-# Assume you already have a GeoDataFrame containing country geometries
-geo_df = gpd.read_file('../data/ne_110m_admin_0_countries_lakes/ne_110m_admin_0_countries_lakes.shp')  # Or other formats
-geo_df['centroid'] = geo_df.geometry.centroid
-geo_df['longitude'] = geo_df.centroid.x
-geo_df['latitude'] = geo_df.centroid.y
-geo_df['area'] = geo_df.geometry.area
+        with _timed('clean columns'):
+            # Gender labels and age decade, the same as in the prepared partitions
+            derive_columns(data)
 
-# Ensure the column names in geo_df match your ISO codes (assumed to be 'iso_code')
-merged = geo_df.merge(billionaires_count, left_on='ISO_A3', right_on='country', how='left').fillna(0)
+            # Scatter point id, so lasso selections can be mapped back to rows
+            data['scatter_group'] = data.groupby(['age', 'industries', 'personName']).ngroup()
 
-# Calculate average finalWorth by age and industries
-df['age_group'] = (df['age'] // 10) * 10
+        with _timed('global statistics'):
+            # Calculate global statistics as initial values
+            richest_person_global = data.loc[data["finalWorth"].idxmax(), ["personName", "finalWorth"]]
+            youngest_billionaire_global = data.loc[data["age"].idxmin(), ["personName", "age"]]
+            oldest_billionaire_global = data.loc[data["age"].idxmax(), ["personName", "age"]]
+            top_industry_global = data.groupby("industries")["finalWorth"].sum().idxmax()
+            top_company_global = data.groupby("source")["finalWorth"].sum().idxmax()
 
-# gender process
-df['gender'] = df['gender'].replace({'M': 'Male', 'F': 'Female'})
+        with _timed('selection index'):
+            # Category bitmasks for the shared cross-filter selection
+            selection_index = SelectionIndex(data)
 
-# Extract richest person
-richest_person = df.loc[df["finalWorth"].idxmax(), ["personName", "finalWorth"]]
+        with _timed('quantile sketches'):
+            quantile_cube = QuantileCube(quantile_dims, ['finalWorth', 'age'], k=quantile_sketch_k).update(data)
 
-# Extract youngest and oldest billionaire
-youngest_billionaire = df.loc[df["age"].idxmin(), ["personName", "age"]]
-oldest_billionaire = df.loc[df["age"].idxmax(), ["personName", "age"]]
+        with _timed('country indicators'):
+            # Per-country indicator matrix for the indicators tab
+            country_indicators = CountryIndicators(data)
 
-# Extract top industry (by total finalWorth)
-top_industry = df.groupby("industries")["finalWorth"].sum().idxmax()
+        # Dropdown options depend on the data
+        country_dropdown.options = [{'label': cou, 'value': cou} for cou in data['countryOfCitizenship'].unique()]
+        industry_dropdown.options = [{'label': ind, 'value': ind} for ind in data['industries'].unique()]
 
-# Extract top company (by total finalWorth) using 'source' column
-top_company = df.groupby("source")["finalWorth"].sum().idxmax()
+        # Published last: callbacks only see a fully prepared dataset
+        df = data
 
 # Color for industries
 industries_color = {
@@ -73,6 +175,12 @@ industries_color = {
     "Telecom": "#9370DB"  # Medium purple 
 }
 
+# Color for genders
+gender_color = {
+    'Male': '#87CEEB',
+    'Female': 'pink'
+}
+
 # color
 bg_color = "#000000"
 card_color = "#333333"
@@ -81,6 +189,15 @@ text_color = "#FFD700"
 
 # Create Dash app with Bootstrap
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True, title='Billionaires Landscape')
+server = app.server  # For WSGI servers, e.g. gunicorn app:server
+
+
+# Prepare the data on the first request if init_data() was not called explicitly
+@server.before_request
+def ensure_data():
+    if df is None:
+        init_data()
+
 
 app.layout = dbc.Container([
     # Main Heading and Tabs in the same row
@@ -99,10 +216,16 @@ app.layout = dbc.Container([
                 dcc.Tab(label='More Info', value='tab-2', 
                         style={'fontSize': '12px', 'borderRadius': '10px', 'width': '120px', 'height': '25px', 'backgroundColor': '#000000', 'color': '#FFD700', 'padding': '1px'}, 
                         selected_style={'fontSize': '12px', 'borderRadius': '10px', 'width': '120px', 'height': '25px', 'backgroundColor': '#000000', 'color': '#FFD700', 'padding': '1px'}),
+                dcc.Tab(label='Indicators', value='tab-3', 
+                        style={'fontSize': '12px', 'borderRadius': '10px', 'width': '120px', 'height': '25px', 'backgroundColor': '#000000', 'color': '#FFD700', 'padding': '1px'}, 
+                        selected_style={'fontSize': '12px', 'borderRadius': '10px', 'width': '120px', 'height': '25px', 'backgroundColor': '#000000', 'color': '#FFD700', 'padding': '1px'}),
             ], style={'height': '50px', 'marginTop': '10px'})
         ], style={'display': 'flex', 'justifyContent': 'flex-end', 'alignItems': 'flex-start', 'flex': '1'})
     ], style={'backgroundColor': '#000000', 'padding': '10px', 'borderBottom': '2px solid #FFD700', 'marginTop': '0', 'textAlign': 'left', 'display': 'flex', 'justifyContent': 'space-between'}),
 
+    # Shared cross-filter selection (map clicks, dropdowns, chart selections)
+    dcc.Store(id='selection-store', data=EMPTY_SELECTION),
+
     # Tab 1 Content: Summary and Map
     html.Div(id='tab-content')
 ], fluid=True, style={'margin': '0px', 'padding': '0px', 'overflow': 'hidden', "padding": "0px", "backgroundColor": bg_color}) 
@@ -184,6 +307,26 @@ tab1_content = dbc.Container([
     style={'width':'100%','height':'666px','alignItems': 'stretch', 'margin': '0px','display': 'flex', 'justifyContent': 'flex-between', 'overflow': 'hidden'})  # Ensure Row layout is reasonable and hide overflow
 ], fluid=True, style={'marginLeft': '0px', 'padding': '0px', 'overflow': 'hidden'})  # Ensure inner Container margin and padding are consistent and hide overflow
 
+# Tab 2 filters (options are filled in by init_data())
+country_dropdown = dcc.Dropdown(
+    id='country-dropdown',
+    options=[],
+    value=[],  # Default to all countries
+    multi=True,
+    persistence=True,
+    placeholder="Select countries",
+    style={'margin': '0', 'width': '100%', 'marginLeft': '5px'}
+)
+industry_dropdown = dcc.Dropdown(
+    id='industry-dropdown',
+    options=[],
+    value=[],  # Default to all industries
+    multi=True,
+    persistence=True,
+    placeholder="Select industries",
+    style={'margin': '0', 'width': '100%', 'marginLeft': '5px', 'marginTop': '10px',}
+)
+
 # Tab 2 Content: Detailed Analysis
 tab2_content = dbc.Container([
     dbc.Row([
@@ -192,27 +335,18 @@ tab2_content = dbc.Container([
             dbc.Card([
                 dbc.CardHeader("Filters", style={'backgroundColor': bg_color, 'color': text_color, 'fontWeight': 'bold', 'textAlign': 'center', 'padding': '0'}),
                 dbc.CardBody([
-                    html.P(
-                        "Default: Global & All Industries",
-                        style={'color': '#cccccc', 'marginBottom': '4px', 'marginTop': '0px', 'fontSize': '14px', 'textAlign': 'center'}
-                    ),
-                    dcc.Dropdown(
-                        id='country-dropdown',
-                        options=[{'label': cou, 'value': cou} for cou in df['countryOfCitizenship'].unique()],
-                        value=[],  # Default to all countries
-                        multi=True,
-                        placeholder="Select countries",
-                        style={'margin': '0', 'width': '100%', 'marginLeft': '5px'}
-                    ),
+                    html.Div([
+                        # Filled in from the shared selection (e.g. a country clicked on the map)
+                        html.Span(id='map-country-text', children="Default: Global & All Industries"),
+                        html.Button(
+                            "Clear", 
+                            id='clear-map-country-button', 
+                            style={'display': 'none', 'marginLeft': '8px', 'backgroundColor': text_color, 'color': '#000000', 'border': '0px', 'borderRadius': '4px', 'fontSize': '12px'}
+                        )
+                    ], style={'color': '#cccccc', 'marginBottom': '4px', 'marginTop': '0px', 'fontSize': '14px', 'textAlign': 'center'}),
+                    country_dropdown,
                     # html.Br(),
-                    dcc.Dropdown(
-                        id='industry-dropdown',
-                        options=[{'label': ind, 'value': ind} for ind in df['industries'].unique()],
-                        value=[],  # Default to all industries
-                        multi=True,
-                        placeholder="Select industries",
-                        style={'margin': '0', 'width': '100%', 'marginLeft': '5px', 'marginTop': '10px',}
-                    )
+                    industry_dropdown
                 ], style={'padding': '0'})
             ], style={"backgroundColor": bg_color, 'height': '186px', 'padding': '0', 'margin': '0'}),
 
@@ -278,11 +412,106 @@ tab2_content = dbc.Container([
                         )
                     ], style={"backgroundColor": bg_color, 'height': '333px', 'padding': '0', 'margin': '0'})
                 ], width=6)
-            ])     
+            ]),
+
+            # line 3
+            dbc.Row([
+                # Quantile box chart
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("Wealth and Age Quantiles", style={'backgroundColor': '#000000', 'color': '#FFD700', 'fontWeight': 'bold', 'textAlign': 'center', 'padding': '0'}),
+                        html.Div([
+                            dcc.RadioItems(
+                                id='quantile-metric',
+                                options=[{'label': 'Wealth', 'value': 'finalWorth'}, {'label': 'Age', 'value': 'age'}],
+                                value='finalWorth',
+                                inline=True,
+                                inputStyle={'marginRight': '4px', 'marginLeft': '10px'}
+                            ),
+                            dcc.RadioItems(
+                                id='quantile-group',
+                                options=[{'label': 'Gender', 'value': 'gender'},
+                                         {'label': 'Industry', 'value': 'industries'},
+                                         {'label': 'Country', 'value': 'countryOfCitizenship'}],
+                                value='gender',
+                                inline=True,
+                                inputStyle={'marginRight': '4px', 'marginLeft': '10px'}
+                            )
+                        ], style={'display': 'flex', 'justifyContent': 'space-between', 'color': '#FFFFFF', 'fontSize': '14px', 'padding': '2px'}),
+                        dcc.Graph(
+                            id='quantile-box-chart',
+                            style={'height': '100%', 'width': '100%', 'margin': '0', 'padding': '0'}
+                        )
+                    ], style={"backgroundColor": bg_color, 'height': '333px', 'padding': '0', 'margin': '0'})
+                ], width=12)
+            ])
         ])
     ])
 ], fluid=True, style={"padding": "0px", "backgroundColor": bg_color})
 
+# Tab 3 Content: Country Indicators
+tab3_content = dbc.Container([
+    dbc.Row([
+        # Controls column
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader("Regression", style={'backgroundColor': bg_color, 'color': text_color, 'fontWeight': 'bold', 'textAlign': 'center', 'padding': '0'}),
+                dbc.CardBody([
+                    html.P(
+                        "Countries with billionaires in the current selection",
+                        style={'color': '#cccccc', 'marginBottom': '4px', 'marginTop': '0px', 'fontSize': '14px', 'textAlign': 'center'}
+                    ),
+                    dcc.Dropdown(
+                        id='indicator-x-dropdown',
+                        options=[{'label': label, 'value': col} for col, label in INDICATORS.items()],
+                        value='gdp_country',
+                        clearable=False,
+                        style={'margin': '0', 'width': '100%'}
+                    ),
+                    dcc.Dropdown(
+                        id='indicator-metric-dropdown',
+                        options=[{'label': label, 'value': col} for col, label in METRICS.items()],
+                        value='billionaire_count',
+                        clearable=False,
+                        style={'margin': '0', 'width': '100%', 'marginTop': '10px'}
+                    ),
+                    dcc.Checklist(
+                        id='indicator-log-checklist',
+                        options=[{'label': 'Log x', 'value': 'x'}, {'label': 'Log y', 'value': 'y'}],
+                        value=['x', 'y'],
+                        inline=True,
+                        inputStyle={'marginRight': '4px', 'marginLeft': '10px'},
+                        style={'color': '#FFFFFF', 'fontSize': '14px', 'marginTop': '10px'}
+                    ),
+                    html.Div(id='regression-summary', style={'color': text_color, 'fontSize': '14px', 'marginTop': '10px', 'whiteSpace': 'pre-line'})
+                ])
+            ], style={"backgroundColor": bg_color, 'height': '666px', 'padding': '0', 'margin': '0'})
+        ], width=3),
+
+        # Correlation matrix
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader("Correlation of Billionaire Metrics and Country Indicators", style={'backgroundColor': bg_color, 'color': text_color, 'fontWeight': 'bold', 'textAlign': 'center', 'padding': '0'}),
+                dcc.Graph(
+                    id='indicator-correlation-heatmap',
+                    style={'height': '100%', 'width': '100%', 'margin': '0', 'padding': '0'}
+                )
+            ], style={"backgroundColor": bg_color, 'height': '666px', 'padding': '0', 'margin': '0'})
+        ], width=5),
+
+        # Regression scatter
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader("Billionaires vs. Country Indicator", style={'backgroundColor': bg_color, 'color': text_color, 'fontWeight': 'bold', 'textAlign': 'center', 'padding': '0'}),
+                dcc.Graph(
+                    id='indicator-regression-chart',
+                    style={'height': '100%', 'width': '100%', 'margin': '0', 'padding': '0'}
+                )
+            ], style={"backgroundColor": bg_color, 'height': '666px', 'padding': '0', 'margin': '0'})
+        ], width=4)
+    ])
+], fluid=True, style={"padding": "0px", "backgroundColor": bg_color})
+
 
 # Callback to switch between tabs
 @app.callback(
@@ -294,6 +523,8 @@ def render_tab_content(tab):
         return tab1_content
     elif tab == 'tab-2':
         return tab2_content
+    elif tab == 'tab-3':
+        return tab3_content
 
 def calculate_zoom_level(area):
     # Define minimum and maximum zoom values
@@ -311,14 +542,6 @@ def calculate_zoom_level(area):
     zoom = zoom_max - (log_area - log_area_min) / (log_area_max - log_area_min) * (zoom_max - zoom_min)
     return max(zoom_min, min(zoom_max, zoom))  # Ensure zoom value is within reasonable range
 
-# Calculate global statistics as initial values
-richest_person_global = df.loc[df["finalWorth"].idxmax(), ["personName", "finalWorth"]]
-youngest_billionaire_global = df.loc[df["age"].idxmin(), ["personName", "age"]]
-oldest_billionaire_global = df.loc[df["age"].idxmax(), ["personName", "age"]]
-top_industry_global = df.groupby("industries")["finalWorth"].sum().idxmax()
-top_company_global = df.groupby("source")["finalWorth"].sum().idxmax()
-
-
 # Callback to update the Key Statistics Column based on clicked country or global data
 @app.callback(
     [Output('richest-person', 'children'),
@@ -423,9 +646,9 @@ def update_map(clickData, n_clicks):
             except Exception as e:
                 print(f"Error processing clickData: {e}")
 
-    fig = px.choropleth_map(
+    fig = _px().choropleth_map(
         merged,
-        geojson=merged.geometry,  # Geographic data
+        geojson=country_geojson,  # Geographic data
         locations=merged.index,   # Use index as location
         color="billionaire_count", # Color mapped to billionaire count
         hover_name="NAME",         # Display country name on hover
@@ -484,6 +707,7 @@ def update_billionaire_count_text(clickData, n_clicks):
                 print("Extracted Country Code:", country_code)
                 
                 # Use pycountry to get country name
+                import pycountry
                 country = pycountry.countries.get(alpha_3=country_code)
                 if country:
                     country_name = country.name
@@ -506,6 +730,98 @@ def update_billionaire_count_text(clickData, n_clicks):
     return f"Global Billionaires Count: {global_billionaire_count}"
 
 
+# Callback to update the shared selection from the map
+@app.callback(
+    Output('selection-store', 'data', allow_duplicate=True),
+    [Input('choropleth-map', 'clickData'),
+     Input('select-all-button', 'n_clicks')],
+    State('selection-store', 'data'),
+    prevent_initial_call=True
+)
+def update_map_selection(clickData, n_clicks, selection):
+    selection = dict(selection or EMPTY_SELECTION)
+    ctx = dash.callback_context
+    trigger_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
+
+    # "Back to Global" clears the map selection
+    selection['country'] = []
+    if trigger_id == 'choropleth-map' and clickData:
+        customdata = clickData['points'][0].get('customdata')
+        if customdata and len(customdata) > 1:
+            selection['country'] = selection_index.codes('country', [customdata[1]])
+    return selection
+
+
+# Tab2 - Callback to update the shared selection from the dropdowns and the scatter lasso
+@app.callback(
+    Output('selection-store', 'data', allow_duplicate=True),
+    [Input('country-dropdown', 'value'),
+     Input('industry-dropdown', 'value'),
+     Input('scatter-chart', 'selectedData')],
+    State('selection-store', 'data'),
+    prevent_initial_call=True
+)
+def update_filter_selection(selected_countries, selected_industries, selectedData, selection):
+    selection = dict(selection or EMPTY_SELECTION)
+    selection['citizenship'] = selection_index.codes('citizenship', selected_countries)
+    selection['industries'] = selection_index.codes('industries', selected_industries)
+
+    # Lasso on the scatter: customdata[2] is the scatter point id
+    selection['rows'] = None
+    if selectedData and selectedData.get('points'):
+        selected_groups = [point['customdata'][2] for point in selectedData['points'] if point.get('customdata')]
+        selection['rows'] = encode_rows(df['scatter_group'].isin(selected_groups).to_numpy())
+    return selection
+
+
+# Tab2 - Callback to clear the country clicked on the map
+@app.callback(
+    Output('selection-store', 'data', allow_duplicate=True),
+    Input('clear-map-country-button', 'n_clicks'),
+    State('selection-store', 'data'),
+    prevent_initial_call=True
+)
+def clear_map_country(n_clicks, selection):
+    if not n_clicks:
+        return dash.no_update
+    return {**(selection or EMPTY_SELECTION), 'country': []}
+
+
+# Tab2 - Callback to show the country clicked on the map, which filters every Tab 2 chart
+@app.callback(
+    [Output('map-country-text', 'children'),
+     Output('clear-map-country-button', 'style')],
+    Input('selection-store', 'data'),
+    State('clear-map-country-button', 'style')
+)
+def update_map_country_text(selection, button_style):
+    iso_codes = selection_index.values('country', (selection or {}).get('country'))
+    if not iso_codes:
+        return "Default: Global & All Industries", {**button_style, 'display': 'none'}
+    names = geo_df.set_index('ISO_A3')['NAME']
+    country_names = [names.get(code, code) for code in iso_codes]
+    return f"Map country: {', '.join(country_names)}", {**button_style, 'display': 'inline-block'}
+
+
+# Tab2 - Callback to toggle an industry in the dropdown when its pie slice is clicked
+@app.callback(
+    Output('industry-dropdown', 'value'),
+    Input('pie-chart', 'clickData'),
+    State('industry-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def select_industry_from_pie(clickData, selected_industries):
+    selected_industries = list(selected_industries or [])
+    if not clickData:
+        return selected_industries
+    industry = clickData['points'][0].get('label')
+    if industry in selected_industries:
+        selected_industries.remove(industry)
+    else:
+        selected_industries.append(industry)
+    return selected_industries
+
+
 # Tab2 - Callback to update the legend based on the selected industries
 @app.callback(
     Output('legend', 'children'),
@@ -528,26 +844,17 @@ def update_legend(selected_industries):
 # Callback to update the scatter plot based on the selected filters
 @app.callback(
     Output('scatter-chart', 'figure'),
-    [Input('country-dropdown', 'value'),
-     Input('industry-dropdown', 'value')]
+    Input('selection-store', 'data')
 )
-def update_scatter_chart(selected_countries, selected_industries):
-    # Start with the full dataframe
-    filtered_df = df.copy()
-
-    # Filter by selected countries if any are selected
-    if selected_countries:
-        filtered_df = filtered_df[filtered_df['countryOfCitizenship'].isin(selected_countries)]
-
-    # Filter by selected industries if any are selected
-    if selected_industries:
-        filtered_df = filtered_df[filtered_df['industries'].isin(selected_industries)]
+def update_scatter_chart(selection):
+    # Rows in the shared selection; the scatter ignores its own lasso and highlights it instead
+    filtered_df = df[selection_index.mask(selection, exclude=('rows',))]
 
     # Prepare the data for the scatter plot
-    scatter_data = filtered_df.groupby(['age', 'industries', 'personName'])['finalWorth'].sum().reset_index()
+    scatter_data = filtered_df.groupby(['age', 'industries', 'personName', 'scatter_group'])['finalWorth'].sum().reset_index()
 
     # Create the scatter plot
-    fig = px.scatter(
+    fig = _px().scatter(
         scatter_data,
         x='age',
         y='finalWorth',
@@ -555,9 +862,15 @@ def update_scatter_chart(selected_countries, selected_industries):
         color_discrete_map=industries_color,
         size_max=8,
         labels={'finalWorth': 'Sum of Wealth ($M)', 'age': 'Age', 'industries': 'Industry'},
-        hover_data={'personName': True, 'age': True, 'finalWorth': True, 'industries': True} 
+        hover_data={'personName': True, 'age': True, 'finalWorth': True, 'industries': True, 'scatter_group': False}
     )
 
+    # Highlight the lasso selection (customdata[2] is the scatter point id)
+    if selection and selection.get('rows'):
+        selected_groups = df.loc[selection_index.mask(selection), 'scatter_group'].to_numpy()
+        for trace in fig.data:
+            trace.selectedpoints = np.flatnonzero(np.isin(trace.customdata[:, 2].astype(int), selected_groups))
+
     # Customize the tooltip
     fig.update_traces(
         hovertemplate="<b>%{customdata[0]}</b><br>Industry: %{customdata[1]}<br>Age: %{x}<br>Total Wealth: $%{y}M<extra></extra>"
@@ -571,28 +884,21 @@ def update_scatter_chart(selected_countries, selected_industries):
         plot_bgcolor=card_color,
         paper_bgcolor=card_color,
         showlegend = False,
+        dragmode='lasso',  # Lasso selects billionaires for the other charts
+        uirevision='scatter',  # Keep the lasso outline when the figure updates
     )
 
-    return fig
+    return compact_figure(fig)
 
 
 # Callback to update the stacked bar chart based on the selected filters
 @app.callback(
     Output('stacked-bar-chart', 'figure'),
-    [Input('country-dropdown', 'value'),
-     Input('industry-dropdown', 'value')]
+    Input('selection-store', 'data')
 )
-def update_stacked_bar_chart(selected_countries, selected_industries):
-    # Start with the full dataframe
-    filtered_df = df.copy()
-
-    # Filter by selected countries if any are selected
-    if selected_countries:
-        filtered_df = filtered_df[filtered_df['countryOfCitizenship'].isin(selected_countries)]
-
-    # Filter by selected industries if any are selected
-    if selected_industries:
-        filtered_df = filtered_df[filtered_df['industries'].isin(selected_industries)]
+def update_stacked_bar_chart(selection):
+    # Rows in the shared selection
+    filtered_df = df[selection_index.mask(selection)]
 
     # Handle the case when no data is available after filtering
     if filtered_df.empty:
@@ -603,23 +909,18 @@ def update_stacked_bar_chart(selected_countries, selected_industries):
             font=dict(color=text_color),
             margin=dict(l=1, r=1, t=10, b=1)
         )
-        return fig
+        return compact_figure(fig)
     
     # Prepare the data for the stacked bar chart
     stacked_bar_data = filtered_df.groupby(['age_group', 'gender']).size().reset_index(name='count')
 
     # Create the stacked bar chart
-    custom_colors = {
-        'Male': '#87CEEB',
-        'Female': 'pink'
-    }
-
-    fig = px.bar(
+    fig = _px().bar(
         stacked_bar_data,
         x='age_group',
         y='count',
         color='gender',
-        color_discrete_map=custom_colors,
+        color_discrete_map=gender_color,
         labels={'age_group': 'Age Decade', 'count': 'Count', 'gender': 'Gender'},
         hover_data={'age_group': True, 'count': True},
         text='gender'
@@ -653,26 +954,17 @@ def update_stacked_bar_chart(selected_countries, selected_industries):
         )
     )
 
-    return fig
+    return compact_figure(fig)
 
 
 # Callback to update the pie chart based on the selected filters
 @app.callback(
     Output('pie-chart', 'figure'),  
-    [Input('country-dropdown', 'value'),
-     Input('industry-dropdown', 'value')]
+    Input('selection-store', 'data')
 )
-def update_pie_chart(selected_countries, selected_industries):
-    # Start with the full dataframe
-    filtered_df = df.copy()
-
-    # Filter by selected countries if any are selected
-    if selected_countries:
-        filtered_df = filtered_df[filtered_df['countryOfCitizenship'].isin(selected_countries)]
-
-    # Filter by selected industries if any are selected
-    if selected_industries:
-        filtered_df = filtered_df[filtered_df['industries'].isin(selected_industries)]
+def update_pie_chart(selection):
+    # Rows in the shared selection; the pie ignores its own industries and highlights them instead
+    filtered_df = df[selection_index.mask(selection, exclude=('industries',))]
 
     # Handle the case when no data is available after filtering
     if filtered_df.empty:
@@ -683,7 +975,7 @@ def update_pie_chart(selected_countries, selected_industries):
             font=dict(color=text_color),
             margin=dict(l=1, r=1, t=10, b=1)
         )
-        return fig
+        return compact_figure(fig)
 
     # Group data by industries and compute total wealth per industry
     selected_df = filtered_df.groupby("industries", as_index=False)["finalWorth"].sum()
@@ -697,7 +989,7 @@ def update_pie_chart(selected_countries, selected_industries):
     top_3_industries = selected_df.iloc[:3]["industries"].tolist()
 
     # Create Plotly Pie Chart
-    fig = px.pie(
+    fig = _px().pie(
         selected_df, 
         names="industries", 
         values="finalWorth", 
@@ -727,6 +1019,15 @@ def update_pie_chart(selected_countries, selected_industries):
     # Remove the black border around slices
     fig.update_traces(marker=dict(line=dict(width=0))) 
 
+    # Pull out the selected industries, so more slices can be clicked to add them
+    selected_industries = selection_index.values('industries', (selection or {}).get('industries'))
+    if selected_industries:
+        is_selected = selected_df["industries"].isin(selected_industries).to_numpy()
+        fig.update_traces(
+            pull=np.where(is_selected, 0.1, 0).tolist(),
+            marker=dict(line=dict(color='white', width=np.where(is_selected, 2, 0).tolist()))
+        )
+
     # Update layout to match dark theme
     fig.update_layout(
         margin=dict(l=1, r=1, t=10, b=1),
@@ -737,26 +1038,18 @@ def update_pie_chart(selected_countries, selected_industries):
         showlegend=False
     )
 
-    return fig
+    return compact_figure(fig)
 
 
 # Callback to update the top 10 sources bar chart based on the selected filters
 @app.callback(
     Output('top-sources-bar-chart', 'figure'),
-    [Input('country-dropdown', 'value'),
-     Input('industry-dropdown', 'value')]
+    Input('selection-store', 'data')
 )
-def update_top_sources_bar_chart(selected_countries, selected_industries):
-    # Start with the full dataframe
-    filtered_df = df.copy()
+def update_top_sources_bar_chart(selection):
+    # Rows in the shared selection (global top 10 sources if nothing is selected)
+    filtered_df = df[selection_index.mask(selection)]
 
-    # Default: Show global top 10 sources if no filters are selected
-    if selected_countries:
-        filtered_df = filtered_df[filtered_df['countryOfCitizenship'].isin(selected_countries)]
-    
-    if selected_industries:
-        filtered_df = filtered_df[filtered_df['industries'].isin(selected_industries)]
-    
     # Group by source and industry, summing finalWorth
     top_sources = filtered_df.groupby(['source', 'industries'], as_index=False)['finalWorth'].sum()
     
@@ -770,7 +1063,7 @@ def update_top_sources_bar_chart(selected_countries, selected_industries):
     top_sources = top_sources[top_sources['source'].isin(top_sources_list)]
 
     # Create the horizontal bar chart
-    fig = px.bar(
+    fig = _px().bar(
         top_sources,
         x='finalWorth',
         y='source',
@@ -801,9 +1094,153 @@ def update_top_sources_bar_chart(selected_countries, selected_industries):
         title_text=None  # Remove plot title
     )
 
-    return fig
+    return compact_figure(fig)
+
+
+# Callback to update the quantile box chart based on the shared selection
+@app.callback(
+    Output('quantile-box-chart', 'figure'),
+    [Input('selection-store', 'data'),
+     Input('quantile-metric', 'value'),
+     Input('quantile-group', 'value')]
+)
+def update_quantile_box_chart(selection, metric, group_by):
+    selection = selection or EMPTY_SELECTION
+
+    if selection.get('rows'):
+        # Lassoed rows are not a cube dimension: sketch just those rows, one sketch per group
+        selected = df.loc[selection_index.mask(selection), [group_by, metric]]
+        groups = {name: {metric: KLLSketch(quantile_sketch_k).update(rows[metric].to_numpy())}
+                  for name, rows in selected.groupby(group_by, sort=False)}
+    else:
+        # Merge the cube cells matching the selection
+        filters = {
+            'country': selection_index.values('country', selection.get('country')),
+            'countryOfCitizenship': selection_index.values('citizenship', selection.get('citizenship')),
+            'industries': selection_index.values('industries', selection.get('industries')),
+        }
+        groups = quantile_cube.query(filters, group_by=group_by)
+
+    # Drop unknown groups and keep the 15 largest
+    groups = {name: sketches[metric] for name, sketches in groups.items() if name == name and sketches[metric].count}
+    names = sorted(groups, key=lambda name: groups[name].count, reverse=True)[:15]
+    colors = {'gender': gender_color, 'industries': industries_color}.get(group_by, {})
+
+    fig = go.Figure()
+    for name in names:
+        p01, q1, median, q3, p90, p99 = groups[name].quantiles([0.01, 0.25, 0.5, 0.75, 0.9, 0.99])
+        color = colors.get(name, text_color)
+
+        # Box spans p1 to p99 with the quartiles in between
+        fig.add_trace(go.Box(
+            x=[name], q1=[q1], median=[median], q3=[q3], lowerfence=[p01], upperfence=[p99],
+            name=name, marker_color=color, line=dict(width=1), hoverinfo='y'
+        ))
+        fig.add_trace(go.Scatter(
+            x=[name], y=[p90], mode='markers', marker=dict(symbol='diamond', size=8, color=color),
+            hovertemplate=f"<b>{name}</b><br>p90: %{{y}}<extra></extra>"
+        ))
+
+    value_label = 'Wealth ($M)' if metric == 'finalWorth' else 'Age'
+    fig.update_layout(
+        margin=dict(l=1, r=1, t=1, b=1),
+        autosize=True,
+        xaxis=dict(color='white'),
+        yaxis=dict(title=value_label, color='white', showgrid=True, gridcolor='#cccccc',
+                   type='log' if metric == 'finalWorth' else 'linear'),
+        plot_bgcolor=card_color,
+        paper_bgcolor=card_color,
+        font=dict(color=text_color),
+        showlegend=False
+    )
+
+    return compact_figure(fig)
+
+
+# Tab3 - Callback to update the indicator correlation heatmap based on the shared selection
+@app.callback(
+    Output('indicator-correlation-heatmap', 'figure'),
+    Input('selection-store', 'data')
+)
+def update_indicator_correlation_heatmap(selection):
+    # A single clicked country would leave nothing to correlate, so ignore the map selection
+    mask = selection_index.mask(selection, exclude=('country',))
+    countries, columns, values = country_indicators.table(mask)
+    corr = correlation_matrix(values)
+
+    labels = [{**METRICS, **INDICATORS}[col] for col in columns]
+    fig = go.Figure(go.Heatmap(
+        z=np.round(corr, 2),
+        x=labels,
+        y=labels,
+        zmin=-1,
+        zmax=1,
+        colorscale=[[0, '#1E90FF'], [0.5, card_color], [1, '#FFD700']],
+        texttemplate='%{z:.2f}',
+        hovertemplate="<b>%{y}</b><br>%{x}<br>Correlation: %{z:.2f}<extra></extra>",
+        colorbar=dict(tickfont=dict(color='white'))
+    ))
+    fig.update_layout(
+        margin=dict(l=1, r=1, t=1, b=1),
+        autosize=True,
+        xaxis=dict(color='white', tickangle=45),
+        yaxis=dict(color='white', autorange='reversed'),
+        plot_bgcolor=card_color,
+        paper_bgcolor=card_color,
+        font=dict(color=text_color, size=10)
+    )
+
+    return compact_figure(fig)
+
+
+# Tab3 - Callback to update the regression chart based on the shared selection and chosen columns
+@app.callback(
+    [Output('indicator-regression-chart', 'figure'),
+     Output('regression-summary', 'children')],
+    [Input('selection-store', 'data'),
+     Input('indicator-x-dropdown', 'value'),
+     Input('indicator-metric-dropdown', 'value'),
+     Input('indicator-log-checklist', 'value')]
+)
+def update_indicator_regression_chart(selection, indicator, metric, log_axes):
+    mask = selection_index.mask(selection, exclude=('country',))
+    countries, columns, values = country_indicators.table(mask)
+    log_axes = log_axes or []
+
+    keep, x, y, slope, intercept, r2 = linear_regression(
+        values[:, columns.index(indicator)], values[:, columns.index(metric)],
+        log_x='x' in log_axes, log_y='y' in log_axes)
+
+    fig = go.Figure(go.Scatter(
+        x=x, y=y, mode='markers', text=countries[keep],
+        marker=dict(color=text_color, size=8),
+        hovertemplate="<b>%{text}</b><br>x: %{x:.3g}<br>y: %{y:.3g}<extra></extra>"
+    ))
+    if np.isfinite(slope):
+        x_line = np.array([x.min(), x.max()])
+        fig.add_trace(go.Scatter(x=x_line, y=intercept + slope * x_line, mode='lines',
+                                 line=dict(color='#FFFFFF', width=2), hoverinfo='skip'))
+
+    x_title = ('log10 ' if 'x' in log_axes else '') + INDICATORS[indicator]
+    y_title = ('log10 ' if 'y' in log_axes else '') + METRICS[metric]
+    fig.update_layout(
+        margin=dict(l=1, r=1, t=1, b=1),
+        autosize=True,
+        xaxis=dict(title=x_title, color='white', showgrid=True, gridcolor='#cccccc'),
+        yaxis=dict(title=y_title, color='white', showgrid=True, gridcolor='#cccccc'),
+        plot_bgcolor=card_color,
+        paper_bgcolor=card_color,
+        showlegend=False
+    )
+
+    if np.isfinite(slope):
+        summary = f"Countries: {len(x)}\nSlope: {slope:.3g}\nIntercept: {intercept:.3g}\nR²: {r2:.3f}"
+    else:
+        summary = f"Countries: {len(x)}\nNot enough data for a regression"
+    return compact_figure(fig), summary
 
 
 # Run the app
 if __name__ == '__main__':
+    init_data()
     app.run_server(debug=True)
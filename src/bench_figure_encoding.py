@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Benchmark: default Plotly JSON output vs. compact typed-array encoding.
+
+Plotly's default output already carries numeric arrays as f8/i8 typed
+arrays; the compact variant adds downcasting, float32 precision and plain
+lists for object arrays.
+
+Run from ``src``:  python bench_figure_encoding.py --rows 100000 200000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+from figure_encoding import compact_figure
+
+
+def build_scatter(n_rows, seed=0):
+    """Build the Tab 2 scatter figure on ``n_rows`` resampled billionaires."""
+    df = pd.read_csv('../data/Billionaires_Statistics_Updated_Countrycoded.csv',
+                     usecols=['age', 'industries', 'personName', 'finalWorth'])
+    rng = np.random.default_rng(seed)
+    big = df.sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+    # Jitter so points are distinct, as they would be on a larger dataset
+    big['age'] = big['age'] + rng.integers(-3, 4, len(big))
+    big['finalWorth'] = big['finalWorth'] * rng.uniform(0.5, 1.5, len(big))
+
+    return px.scatter(
+        big,
+        x='age',
+        y='finalWorth',
+        color='industries',
+        hover_data={'personName': True, 'age': True, 'finalWorth': True, 'industries': True}
+    )
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 200000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--float-dtype', default='float32', choices=['float32', 'float64'])
+    parser.add_argument('--decimals', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'variant':<28} {'encode (ms)':>12} {'payload (KB)':>13}")
+    for n_rows in args.rows:
+        fig = build_scatter(n_rows)
+        variants = {
+            'default (json)': lambda: to_json_plotly(fig, engine='json'),
+            'default (orjson)': lambda: to_json_plotly(fig, engine='orjson'),
+            f'compact {args.float_dtype} (orjson)': lambda: to_json_plotly(
+                compact_figure(fig, float_dtype=args.float_dtype, decimals=args.decimals), engine='orjson'),
+        }
+        for name, func in variants.items():
+            seconds, payload = timed(func, args.repeat)
+            print(f"{n_rows:>8} {name:<28} {seconds * 1000:>12.1f} {len(payload) / 1024:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Offline build step for the map geometry.
+
+Turns the Natural Earth shapefile into a plain GeoJSON file and a small
+attribute table (ISO code, name, centroid, area), so the app can serve the
+map without importing geopandas.
+
+Run from ``src``:  python build_geo.py
+"""
+
+import json
+import os
+import warnings
+
+SHAPEFILE = '../data/ne_110m_admin_0_countries_lakes/ne_110m_admin_0_countries_lakes.shp'
+GEO_DIR = '../data/geo'
+GEOJSON_PATH = os.path.join(GEO_DIR, 'countries.geojson')
+ATTRIBUTES_PATH = os.path.join(GEO_DIR, 'countries.csv')
+
+
+def map_iso_codes(shapes):
+    """ISO alpha-3 code the map joins on, per shape.
+
+    Natural Earth sets ISO_A3 to -99 for a few countries (France, Norway),
+    so ADM0_A3 is used for those.
+    """
+    return shapes['ISO_A3'].where(shapes['ISO_A3'] != '-99', shapes['ADM0_A3'])
+
+
+def build(shapefile=SHAPEFILE, geo_dir=GEO_DIR):
+    """Write ``countries.geojson`` and ``countries.csv`` under ``geo_dir``."""
+    import geopandas as gpd
+
+    geo_df = gpd.read_file(shapefile)
+    with warnings.catch_warnings():
+        # Centroids and areas in degrees are only used to center and zoom the map
+        warnings.simplefilter('ignore', UserWarning)
+        centroid = geo_df.geometry.centroid
+        geo_df['longitude'] = centroid.x
+        geo_df['latitude'] = centroid.y
+        geo_df['area'] = geo_df.geometry.area
+
+    geo_df['ISO_A3'] = map_iso_codes(geo_df)
+
+    os.makedirs(geo_dir, exist_ok=True)
+    with open(os.path.join(geo_dir, 'countries.geojson'), 'w') as f:
+        json.dump(geo_df.geometry.__geo_interface__, f)
+    geo_df[['ISO_A3', 'NAME', 'longitude', 'latitude', 'area']].to_csv(
+        os.path.join(geo_dir, 'countries.csv'), index=False)
+
+
+if __name__ == '__main__':
+    build()
+    print(f'Wrote {GEOJSON_PATH} and {ATTRIBUTES_PATH}')
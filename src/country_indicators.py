@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Country-level indicators as a NumPy matrix for vectorized analytics.
+
+The CSV repeats each country's indicators (CPI, GDP, tax, population, ...) on
+every billionaire row. ``CountryIndicators`` dedupes them once at load into a
+``(countries x indicators)`` matrix and keeps each row's country code, so
+per-country billionaire counts, correlations and regressions for any row
+mask are a few array operations.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ingest import parse_money
+
+# Indicator column -> display label
+INDICATORS = {
+    'cpi_country': 'CPI',
+    'gdp_country': 'GDP ($)',
+    'tax_revenue_country_country': 'Tax Revenue (% of GDP)',
+    'total_tax_rate_country': 'Total Tax Rate (%)',
+    'population_country': 'Population',
+    'life_expectancy_country': 'Life Expectancy',
+}
+
+# Billionaire metric -> display label
+METRICS = {
+    'billionaire_count': 'Billionaires',
+    'density': 'Billionaires per Million People',
+    'wealth_per_capita': 'Billionaire Wealth per Capita ($)',
+    'wealth_to_gdp': 'Billionaire Wealth (% of GDP)',
+}
+
+
+class CountryIndicators:
+    """Per-country indicator matrix plus each row's country code."""
+
+    def __init__(self, df, country_column='country', worth_column='finalWorth'):
+        codes, countries = pd.factorize(df[country_column], sort=True)
+        self.countries = np.asarray(countries)
+        self.row_codes = codes  # -1 where the country is missing
+        self.worth = df[worth_column].to_numpy(dtype=np.float64)
+
+        # One row of indicators per country: first non-null value seen
+        indicators = df[list(INDICATORS)].copy()
+        if not pd.api.types.is_numeric_dtype(indicators['gdp_country']):
+            # Raw CSV stores GDP as '$2,715,518,274,227 '
+            indicators['gdp_country'] = parse_money(indicators['gdp_country'])
+        per_country = indicators[codes >= 0].groupby(codes[codes >= 0]).first()
+        self.indicator_names = list(INDICATORS)
+        self.matrix = per_country.reindex(range(len(self.countries))).to_numpy(dtype=np.float64)
+
+    def metrics(self, mask=None):
+        """``(countries x metrics)`` billionaire metrics for the rows in ``mask``."""
+        valid = self.row_codes >= 0
+        if mask is not None:
+            valid = valid & mask
+        n = len(self.countries)
+        count = np.bincount(self.row_codes[valid], minlength=n).astype(np.float64)
+        worth = np.bincount(self.row_codes[valid], weights=self.worth[valid], minlength=n) * 1e6  # $M -> $
+
+        population = self.matrix[:, self.indicator_names.index('population_country')]
+        gdp = self.matrix[:, self.indicator_names.index('gdp_country')]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density = count / population * 1e6
+            wealth_per_capita = worth / population
+            wealth_to_gdp = worth / gdp * 100
+        return np.column_stack([count, density, wealth_per_capita, wealth_to_gdp])
+
+    def table(self, mask=None):
+        """Metrics and indicators side by side, for countries with billionaires in ``mask``.
+
+        Returns ``(countries, columns, values)``.
+        """
+        metrics = self.metrics(mask)
+        present = metrics[:, 0] > 0
+        values = np.hstack([metrics, self.matrix])[present]
+        return self.countries[present], list(METRICS) + self.indicator_names, values
+
+
+def correlation_matrix(values):
+    """Pearson correlation of the columns of ``values``, using pairwise complete rows."""
+    valid = np.isfinite(values).astype(np.float64)
+    x = np.where(valid > 0, values, 0.0)
+
+    n = valid.T @ valid
+    sum_x = x.T @ valid      # sum of column i over rows where i and j are both valid
+    sum_y = sum_x.T
+    sum_xx = (x * x).T @ valid
+    sum_yy = sum_xx.T
+    sum_xy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sum_xy - sum_x * sum_y
+        corr = cov / np.sqrt((n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2))
+    corr[n < 3] = np.nan
+    return np.clip(corr, -1, 1)
+
+
+def linear_regression(x, y, log_x=False, log_y=False):
+    """Ordinary least squares ``y ~ a + b x`` on the finite (and positive, if logged) pairs.
+
+    Returns ``(keep, x, y, slope, intercept, r2)``: the mask of pairs used and
+    those pairs, already transformed.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.log10(x) if log_x else x
+        y = np.log10(y) if log_y else y
+    keep = np.isfinite(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    if len(x) < 3 or np.ptp(x) == 0:
+        return keep, x, y, np.nan, np.nan, np.nan
+
+    design = np.column_stack([np.ones_like(x), x])
+    (intercept, slope), residuals, _, _ = np.linalg.lstsq(design, y, rcond=None)
+    ss_res = residuals[0] if len(residuals) else np.sum((y - design @ [intercept, slope]) ** 2)
+    ss_tot = np.sum((y - y.mean()) ** 2)
+    r2 = 1 - ss_res / ss_tot if ss_tot else np.nan
+    return keep, x, y, slope, intercept, r2
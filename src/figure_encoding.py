@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Compact JSON encoding for Plotly figures returned by the callbacks.
+
+Plotly 6 already sends numeric ndarrays as base64 typed arrays
+(``{"dtype": "f8", "bdata": "..."}``) at their original dtype. On top of
+that, ``compact_figure``:
+
+- downcasts typed arrays to the smallest int type that holds them, or to
+  float32 (configurable) for non-integral values;
+- types numeric data that plotly leaves as object arrays or lists
+  (e.g. ``customdata`` mixing numbers with nullable columns);
+- turns the remaining object arrays (names, categories) into plain lists,
+  which orjson serializes much faster than object ndarrays.
+"""
+
+import base64
+
+import numpy as np
+import pandas as pd
+
+# Default precision for non-integral float arrays
+FLOAT_DTYPE = 'float32'
+
+# Trace keys that are never data arrays, even if they hold a list of numbers
+_SKIPPED_KEYS = {'hovertemplate', 'texttemplate', 'text', 'hovertext', 'ids', 'name', 'legendgroup'}
+
+# numpy dtype -> plotly.js typed array name
+_TYPED_ARRAY_NAMES = {
+    'int8': 'i1', 'uint8': 'u1',
+    'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4',
+    'float32': 'f4', 'float64': 'f8',
+}
+
+_INT_DTYPES = [np.int8, np.int16, np.int32]
+
+
+def _as_numeric_array(value):
+    """Return ``value`` as a numeric ndarray, or None if it is not numeric data."""
+    if isinstance(value, dict) and 'bdata' in value:
+        # Already encoded by plotly, decode so it can be downcast
+        arr = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+        if 'shape' in value:
+            arr = arr.reshape([int(n) for n in str(value['shape']).split(',')])
+        return arr
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return None
+        try:
+            value = np.asarray(value)
+        except ValueError:
+            # Ragged nested lists
+            return None
+    if not isinstance(value, np.ndarray) or value.size == 0:
+        return None
+    if value.dtype.kind == 'b':
+        return None
+    if value.dtype.kind == 'O':
+        # Only real numbers: numeric-looking strings ('2020') stay categories
+        if pd.api.types.infer_dtype(value.ravel(), skipna=True) not in ('integer', 'floating', 'mixed-integer-float'):
+            return None
+        value = value.astype(np.float64)
+    if value.dtype.kind not in 'iuf' or value.ndim > 2:
+        return None
+    return value
+
+
+def _downcast(arr, float_dtype, decimals):
+    """Shrink ``arr`` to the smallest dtype that keeps the requested precision."""
+    if arr.dtype.kind == 'f':
+        if np.all(np.isfinite(arr)) and np.all(arr == np.round(arr)):
+            # Integral floats (ages, worth in $M) are sent as integers
+            arr = arr.astype(np.int64)
+        else:
+            if decimals is not None:
+                arr = np.round(arr, decimals)
+            return arr.astype(float_dtype)
+
+    lo, hi = arr.min(), arr.max()
+    for dtype in _INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return arr.astype(dtype)
+    return arr.astype(np.float64)
+
+
+def to_typed_array(value, float_dtype=FLOAT_DTYPE, decimals=None):
+    """Encode a numeric array as a plotly.js typed array spec.
+
+    Non-numeric arrays are returned as plain lists, other values unchanged.
+    """
+    arr = _as_numeric_array(value)
+    if arr is None:
+        # Plain lists serialize much faster than object arrays
+        return value.tolist() if isinstance(value, np.ndarray) else value
+    arr = np.ascontiguousarray(_downcast(arr, float_dtype, decimals))
+    spec = {
+        'dtype': _TYPED_ARRAY_NAMES[arr.dtype.name],
+        'bdata': base64.b64encode(arr.tobytes()).decode('ascii'),
+    }
+    if arr.ndim > 1:
+        spec['shape'] = ','.join(str(n) for n in arr.shape)
+    return spec
+
+
+def _encode_node(node, float_dtype, decimals):
+    for key, value in node.items():
+        if key in _SKIPPED_KEYS:
+            continue
+        if isinstance(value, dict) and 'bdata' not in value:
+            _encode_node(value, float_dtype, decimals)
+        else:
+            node[key] = to_typed_array(value, float_dtype, decimals)
+
+
+def compact_figure(fig, float_dtype=FLOAT_DTYPE, decimals=None):
+    """Return ``fig`` as a plain dict with every numeric trace array typed.
+
+    ``float_dtype`` ('float32' or 'float64') sets the precision kept for
+    non-integral values; ``decimals`` optionally rounds them first. Integral
+    arrays are packed into the smallest int type that holds them.
+    """
+    fig_dict = fig.to_plotly_json() if hasattr(fig, 'to_plotly_json') else dict(fig)
+    data = []
+    for trace in fig_dict.get('data', []):
+        trace = dict(trace)
+        _encode_node(trace, float_dtype, decimals)
+        data.append(trace)
+    fig_dict['data'] = data
+    return fig_dict
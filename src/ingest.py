@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Chunked ingestion and cleaning of the billionaires CSV.
+
+Reads the source CSV ``chunksize`` rows at a time, cleans and validates each
+chunk with vectorized pandas operations and writes it out as a prepared
+partition, so files larger than memory can be prepared. Rows that fail
+validation go to ``rejected.csv`` with a reason, and ``report.json``
+summarises the run.
+
+Run from ``src``:
+
+    python ingest.py ../data/Billionaires_Statistics_Updated_Countrycoded.csv ../data/prepared
+"""
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+SHAPEFILE = '../data/ne_110m_admin_0_countries_lakes/ne_110m_admin_0_countries_lakes.shp'
+
+NUMERIC_COLUMNS = [
+    'rank', 'finalWorth', 'age', 'birthYear', 'birthMonth', 'birthDay',
+    'cpi_country', 'cpi_change_country', 'gross_tertiary_education_enrollment',
+    'gross_primary_education_enrollment_country', 'life_expectancy_country',
+    'tax_revenue_country_country', 'total_tax_rate_country', 'population_country',
+    'latitude_country', 'longitude_country',
+]
+DATE_COLUMNS = {'birthDate': '%m/%d/%Y %H:%M', 'date': '%m/%d/%Y %H:%M'}
+MONEY_COLUMNS = ['gdp_country']
+
+
+def load_iso_codes(shapefile=SHAPEFILE):
+    """ISO alpha-3 codes of the countries drawn on the map (the key the map joins on)."""
+    import geopandas as gpd
+    from build_geo import map_iso_codes
+
+    shapes = gpd.read_file(shapefile, ignore_geometry=True)
+    return set(map_iso_codes(shapes))
+
+
+def parse_money(values):
+    """Parse strings like '$2,715,518,274,227 ' into floats (NaN if invalid)."""
+    cleaned = values.str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def derive_columns(frame):
+    """Add the columns the app derives from the cleaned data, in place.
+
+    Shared by ``clean_chunk`` and ``app.init_data`` so both paths agree.
+    """
+    # Readable gender labels
+    frame['gender'] = frame['gender'].replace({'M': 'Male', 'F': 'Female'})
+    # Age decade for the age charts
+    frame['age_group'] = (frame['age'] // 10) * 10
+    return frame
+
+
+def clean_chunk(raw, iso_codes, strict_iso=False):
+    """Clean one chunk of raw (all-string) rows.
+
+    Returns ``(clean, rejected, coerced)``: the cleaned rows, the raw rows
+    that failed validation with a ``reject_reason`` column, and the number of
+    values per column that could not be parsed and were set to NaN.
+    """
+    clean = raw.copy()
+    coerced = {}
+
+    for column in NUMERIC_COLUMNS:
+        clean[column] = pd.to_numeric(raw[column], errors='coerce')
+    for column in MONEY_COLUMNS:
+        clean[column] = parse_money(raw[column])
+    for column, fmt in DATE_COLUMNS.items():
+        clean[column] = pd.to_datetime(raw[column], format=fmt, errors='coerce')
+    for column in [*NUMERIC_COLUMNS, *MONEY_COLUMNS, *DATE_COLUMNS]:
+        bad = int((raw[column].notna() & clean[column].isna()).sum())
+        if bad:
+            coerced[column] = bad
+
+    clean['selfMade'] = raw['selfMade'].map({'True': True, 'False': False})
+    derive_columns(clean)
+    clean['country'] = raw['country'].str.strip().str.upper()
+    clean['iso_on_map'] = clean['country'].isin(iso_codes)
+
+    # Validation, first failing rule wins
+    reasons = pd.Series(None, index=raw.index, dtype=object)
+    rules = [
+        ('missing_name', raw['personName'].isna()),
+        ('invalid_final_worth', ~(clean['finalWorth'] > 0)),
+        ('invalid_age', raw['age'].notna() & ~clean['age'].between(0, 120)),
+        ('malformed_iso_code', clean['country'].notna() & ~clean['country'].str.fullmatch('[A-Z]{3}', na=False)),
+    ]
+    if strict_iso:
+        rules.append(('iso_not_in_shapefile', clean['country'].notna() & ~clean['iso_on_map']))
+    for reason, failed in rules:
+        reasons = reasons.mask(failed & reasons.isna(), reason)
+
+    rejected_mask = reasons.notna().to_numpy()
+    rejected = raw[rejected_mask].assign(reject_reason=reasons[rejected_mask])
+    return clean[~rejected_mask], rejected, coerced
+
+
+def write_partition(frame, out_dir, number, fmt='csv'):
+    name = f'part-{number:05d}.{fmt}'
+    path = os.path.join(out_dir, name)
+    if fmt == 'parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return name
+
+
+def ingest(source, out_dir, chunksize=100000, fmt='csv', strict_iso=False, shapefile=SHAPEFILE):
+    """Clean ``source`` chunk by chunk into partitions under ``out_dir``.
+
+    Returns the run report (also written to ``report.json``).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    iso_codes = load_iso_codes(shapefile)
+    rejected_path = os.path.join(out_dir, 'rejected.csv')
+    if os.path.exists(rejected_path):
+        os.remove(rejected_path)
+
+    report = {'source': source, 'rows_read': 0, 'rows_written': 0, 'rows_rejected': 0,
+              'reject_reasons': {}, 'coerced_to_nan': {}, 'iso_not_on_map': {}, 'partitions': []}
+
+    reader = pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=True)
+    for number, raw in enumerate(reader):
+        clean, rejected, coerced = clean_chunk(raw, iso_codes, strict_iso)
+
+        report['rows_read'] += len(raw)
+        report['rows_written'] += len(clean)
+        report['rows_rejected'] += len(rejected)
+        for counts, new in [(report['reject_reasons'], rejected['reject_reason'].value_counts()),
+                            (report['coerced_to_nan'], coerced),
+                            (report['iso_not_on_map'],
+                             clean.loc[clean['country'].notna() & ~clean['iso_on_map'], 'country'].value_counts())]:
+            for key, count in dict(new).items():
+                counts[key] = counts.get(key, 0) + int(count)
+
+        if len(clean):
+            report['partitions'].append(write_partition(clean, out_dir, number, fmt))
+        if len(rejected):
+            # Keep the source row number so rejects can be traced back
+            rejected.rename_axis('source_row').to_csv(
+                rejected_path, mode='a', header=not os.path.exists(rejected_path))
+
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def read_prepared(out_dir, columns=None):
+    """Load prepared partitions back into one DataFrame."""
+    report_path = os.path.join(out_dir, 'report.json')
+    with open(report_path) as f:
+        partitions = json.load(f)['partitions']
+
+    frames = []
+    for name in partitions:
+        path = os.path.join(out_dir, name)
+        if path.endswith('.parquet'):
+            frames.append(pd.read_parquet(path, columns=columns))
+        else:
+            frames.append(pd.read_csv(path, usecols=columns, parse_dates=[c for c in DATE_COLUMNS if not columns or c in columns]))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prepare the billionaires CSV in chunks.')
+    parser.add_argument('source', help='raw CSV file')
+    parser.add_argument('out_dir', help='directory for prepared partitions and reports')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='partition format (parquet requires pyarrow)')
+    parser.add_argument('--strict-iso', action='store_true',
+                        help='reject rows whose country code is not in the shapefile')
+    args = parser.parse_args()
+
+    report = ingest(args.source, args.out_dir, args.chunksize, args.format, args.strict_iso)
+    print(f"Read {report['rows_read']} rows: {report['rows_written']} written to "
+          f"{len(report['partitions'])} partitions, {report['rows_rejected']} rejected")
+    for reason, count in report['reject_reasons'].items():
+        print(f"  {reason}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""HTTP load test replaying scripted user sessions against the running app.
+
+Each simulated user behaves like a minimal Dash renderer. It loads the
+layout and the callback graph, then for every scripted interaction POSTs to
+``/_dash-update-component`` for each callback the change triggers. Outputs
+are fed back into the client state, so chained callbacks (selection store ->
+charts) and components rendered by a tab switch fire like in the browser.
+
+Run from ``src``:
+
+    python load_test.py --concurrency 1 4 16 --sessions 20
+
+Without ``--url`` the app is started locally in a threaded Flask server.
+To measure worker contention under a production server, start it yourself
+(e.g. ``gunicorn -w 4 app:server``) and pass ``--url``.
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# Countries clicked on the map (ISO codes present in the dataset)
+MAP_COUNTRIES = ['USA', 'CHN', 'IND', 'DEU', 'RUS', 'GBR', 'BRA', 'JPN', 'ITA', 'CAN']
+CITIZENSHIPS = ['United States', 'China', 'India', 'Germany', 'Russia']
+INDUSTRIES = ['Technology', 'Finance & Investments', 'Fashion & Retail', 'Manufacturing', 'Energy']
+
+
+def default_session(rng):
+    """Steps of one scripted session.
+
+    ('set', {'id.prop': value}) changes props, ('click', id) increments
+    ``n_clicks`` and ('think', seconds) pauses.
+    """
+    steps = []
+    for iso in rng.sample(MAP_COUNTRIES, 3):
+        steps.append(('set', {'choropleth-map.clickData': {'points': [{'customdata': [0, iso]}]}}))
+        steps.append(('think', 0.2))
+    steps.append(('click', 'select-all-button'))
+    steps.append(('set', {'tabs.value': 'tab-2'}))
+    steps.append(('set', {'country-dropdown.value': rng.sample(CITIZENSHIPS, 2)}))
+    steps.append(('set', {'industry-dropdown.value': rng.sample(INDUSTRIES, 2)}))
+    steps.append(('set', {'quantile-group.value': 'industries'}))
+    steps.append(('set', {'country-dropdown.value': []}))
+    steps.append(('set', {'industry-dropdown.value': []}))
+    steps.append(('set', {'tabs.value': 'tab-3'}))
+    steps.append(('set', {'indicator-metric-dropdown.value': 'density'}))
+    steps.append(('set', {'tabs.value': 'tab-1'}))
+    return steps
+
+
+def _split_outputs(output):
+    """'..a.b...c.d..' -> ['a.b', 'c.d']; 'a.b' -> ['a.b']."""
+    if output.startswith('..'):
+        return output[2:-2].split('...')
+    return [output]
+
+
+def _collect_props(tree, props):
+    """Record the props of every component with an id in a layout tree."""
+    if isinstance(tree, list):
+        for child in tree:
+            _collect_props(child, props)
+    elif isinstance(tree, dict) and 'props' in tree:
+        component_props = tree['props']
+        if 'id' in component_props and isinstance(component_props['id'], str):
+            for prop, value in component_props.items():
+                if prop != 'children' or not isinstance(value, (dict, list)):
+                    props[f"{component_props['id']}.{prop}"] = value
+            props.setdefault(f"{component_props['id']}.id", component_props['id'])
+        _collect_props(component_props.get('children'), props)
+
+
+def _component_ids(tree, ids):
+    if isinstance(tree, list):
+        for child in tree:
+            _component_ids(child, ids)
+    elif isinstance(tree, dict) and 'props' in tree:
+        if isinstance(tree['props'].get('id'), str):
+            ids.add(tree['props']['id'])
+        _component_ids(tree['props'].get('children'), ids)
+    return ids
+
+
+class Client:
+    """One simulated browser tab."""
+
+    def __init__(self, url, dependencies, layout, recorder):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+        self.dependencies = dependencies
+        self.recorder = recorder
+        self.state = {}
+        self.present = set()
+        self.subtrees = {}   # 'id.children' -> ids rendered into it by a callback
+        self.persisted = {}  # User changes to components with ``persistence``
+        self._add_tree(layout)
+
+    def _add_tree(self, tree):
+        new_ids = _component_ids(tree, set())
+        self.present |= new_ids
+        _collect_props(tree, self.state)
+        # Like the browser, re-rendered components get back their persisted values
+        self.state.update({key: value for key, value in self.persisted.items()
+                           if key.split('.', 1)[0] in new_ids})
+        return new_ids
+
+    def _replace_children(self, key, tree):
+        """Swap the subtree rendered under ``key`` for ``tree``; returns the ids in ``tree``."""
+        removed = self.subtrees.pop(key, set())
+        nested = [k for k in self.subtrees if k.split('.', 1)[0] in removed]
+        while nested:
+            for k in nested:
+                removed |= self.subtrees.pop(k)
+            nested = [k for k in self.subtrees if k.split('.', 1)[0] in removed]
+        self.present -= removed
+        for stale in [k for k in self.state if k.split('.', 1)[0] in removed]:
+            del self.state[stale]
+
+        self.subtrees[key] = self._add_tree(tree)
+        return self.subtrees[key]
+
+    def _ready(self, dep):
+        # Like the renderer, only fire callbacks whose inputs and outputs are all on the page
+        outputs = [o.split('.', 1)[0] for o in _split_outputs(dep['output'])]
+        return all(i['id'] in self.present for i in dep['inputs']) and all(o in self.present for o in outputs)
+
+    def _trigger(self, dep, changed, new_ids):
+        """Input props that trigger ``dep``, or None if it does not fire.
+
+        Like the renderer, callbacks fire for changed inputs and for newly
+        rendered components they read or write. A ``prevent_initial_call``
+        callback still fires when its inputs are rendered into a page that
+        already holds its outputs (e.g. Tab 2 inputs feeding the selection
+        store), but not when the outputs are rendered along with them.
+        """
+        inputs = [f"{i['id']}.{i['property']}" for i in dep['inputs']]
+        trigger = {prop for prop in inputs if prop in changed}
+        new_inputs = {f"{i['id']}.{i['property']}" for i in dep['inputs'] if i['id'] in new_ids}
+        outputs = [o.split('.', 1)[0] for o in _split_outputs(dep['output'])]
+        new_outputs = any(o in new_ids for o in outputs)
+        initial_call = not dep.get('prevent_initial_call')
+        if new_inputs and (initial_call or not new_outputs):
+            trigger |= new_inputs
+        if trigger or (initial_call and new_outputs):
+            return trigger
+        return None
+
+    def _call(self, dep, changed):
+        outputs = [dict(zip(('id', 'property'), o.split('.', 1))) for o in _split_outputs(dep['output'])]
+        body = {
+            'output': dep['output'],
+            'outputs': outputs if dep['output'].startswith('..') else outputs[0],
+            'inputs': [{**i, 'value': self.state.get(f"{i['id']}.{i['property']}")} for i in dep['inputs']],
+            'state': [{**s, 'value': self.state.get(f"{s['id']}.{s['property']}")} for s in dep['state']],
+            'changedPropIds': sorted(changed),
+        }
+        label = ', '.join(o.split('@')[0] for o in _split_outputs(dep['output']))
+        start = time.perf_counter()
+        response = self.session.post(f'{self.url}/_dash-update-component', json=body)
+        self.recorder.record(label, time.perf_counter() - start, response.status_code)
+        if response.status_code != 200:
+            return {}
+        updates = {}
+        for component_id, props in response.json().get('response', {}).items():
+            for prop, value in props.items():
+                updates[f'{component_id}.{prop}'] = value
+        return updates
+
+    def _fire(self, changed, new_ids=()):
+        """Run the callbacks triggered by ``changed`` props, then the ones they trigger.
+
+        Callbacks run in waves. Like the renderer, a callback reading an
+        output of another callback in the same wave waits for it, so it is
+        called once with the updated value rather than once before and once
+        after.
+        """
+        pending = {}
+        while changed or new_ids or pending:
+            triggered = {}
+            for number, dep in enumerate(self.dependencies):
+                if not self._ready(dep):
+                    continue
+                trigger = self._trigger(dep, changed, new_ids)
+                if number in pending:
+                    trigger = (trigger or set()) | pending[number]
+                if trigger is not None:
+                    triggered[number] = trigger
+
+            outputs = {number: {o.split('@')[0] for o in _split_outputs(self.dependencies[number]['output'])}
+                       for number in triggered}
+            pending = {}
+            for number, trigger in triggered.items():
+                inputs = {f"{i['id']}.{i['property']}" for i in self.dependencies[number]['inputs']}
+                if any(inputs & props for other, props in outputs.items() if other != number):
+                    pending[number] = trigger
+            if len(pending) == len(triggered):
+                pending = {}  # Callbacks waiting on each other: run them all
+
+            changed, new_ids = set(), set()
+            for number, trigger in triggered.items():
+                if number in pending:
+                    continue
+                for key, value in self._call(self.dependencies[number], trigger).items():
+                    key = key.split('@')[0]
+                    if key.endswith('.children') and isinstance(value, (dict, list)):
+                        new_ids |= self._replace_children(key, value)
+                    self.state[key] = value
+                    # A callback overrides what the user chose
+                    self.persisted.pop(key, None)
+                    changed.add(key)
+
+    def open(self):
+        start = time.perf_counter()
+        response = self.session.get(f'{self.url}/')
+        self.recorder.record('GET /', time.perf_counter() - start, response.status_code)
+        self._fire(set(), set(self.present))
+
+    def run(self, steps):
+        for action, arg in steps:
+            if action == 'think':
+                time.sleep(arg)
+                continue
+            if action == 'click':
+                key = f'{arg}.n_clicks'
+                arg = {key: (self.state.get(key) or 0) + 1}
+            self.state.update(arg)
+            for key, value in arg.items():
+                if self.state.get(f"{key.split('.', 1)[0]}.persistence"):
+                    self.persisted[key] = value
+            self._fire(set(arg))
+
+
+class Recorder:
+    """Thread-safe latency samples per callback."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, label, seconds, status):
+        with self.lock:
+            self.samples[label].append(seconds)
+            if status not in (200, 204):
+                self.errors[label] += 1
+
+    def report(self, elapsed):
+        total = sum(len(s) for s in self.samples.values())
+        print(f"  {total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s")
+        print(f"  {'callback':<60} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for label, samples in sorted(self.samples.items()):
+            p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+            print(f"  {label[:60]:<60} {len(samples):>6} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {self.errors[label]:>7}")
+
+
+def start_server(port, show_log=False):
+    """Start the app in a subprocess (no debug reloader) and wait until it answers."""
+    code = f"import app; app.init_data(); app.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"
+    output = None if show_log else subprocess.DEVNULL
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=output, stderr=output)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(120):
+        try:
+            requests.get(f'{url}/_dash-layout', timeout=1)
+            return server, url
+        except requests.ConnectionError:
+            if server.poll() is not None:
+                raise RuntimeError('app server exited during startup')
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError('app server did not start')
+
+
+def run_level(url, concurrency, sessions, seed):
+    dependencies = requests.get(f'{url}/_dash-dependencies').json()
+    layout = requests.get(f'{url}/_dash-layout').json()
+    recorder = Recorder()
+
+    def user(number):
+        rng = random.Random(seed + number)
+        client = Client(url, dependencies, layout, recorder)
+        client.open()
+        client.run(default_session(rng))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(user, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    print(f"\nconcurrency={concurrency}: {sessions} sessions, {sessions / elapsed:.2f} sessions/s")
+    recorder.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay scripted sessions against the dashboard over HTTP.')
+    parser.add_argument('--url', help='app to test; started locally when omitted')
+    parser.add_argument('--port', type=int, default=8051)
+    parser.add_argument('--server-log', action='store_true', help='show the output of the local server')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--sessions', type=int, default=20, help='sessions per concurrency level')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(args.port, args.server_log)
+    try:
+        for concurrency in args.concurrency:
+            run_level(url, concurrency, max(args.sessions, concurrency), args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
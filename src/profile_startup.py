@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Startup profile of the app: import time per module and data preparation time per step.
+
+Runs ``import app; app.init_data()`` in a fresh interpreter with
+``-X importtime`` so module imports are measured cold, like a new worker.
+
+Run from ``src``:  python profile_startup.py --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.init_data()
+done = time.perf_counter()
+print(json.dumps({'import': imported - start, 'init': done - imported, 'steps': app.startup_timings}))
+"""
+
+
+def parse_importtime(stderr, depth=1):
+    """Cumulative seconds per module imported at ``depth`` from ``-X importtime`` output.
+
+    Depth 0 is ``app`` itself, depth 1 the modules app imports directly.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Each nesting level is indented by two more spaces
+        name = name.rstrip()[1:]
+        if (len(name) - len(name.lstrip(' '))) // 2 != depth:
+            continue
+        modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative_us) / 1e6
+    return modules
+
+
+def profile():
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD],
+                            cwd=src_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['modules'] = parse_importtime(result.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Break down app startup into imports and data preparation.')
+    parser.add_argument('--top', type=int, default=15, help='number of modules to list')
+    args = parser.parse_args()
+
+    report = profile()
+    total = report['import'] + report['init']
+    print(f"Startup: {total * 1000:.0f} ms  (import app: {report['import'] * 1000:.0f} ms, "
+          f"init_data: {report['init'] * 1000:.0f} ms)")
+
+    print(f"\nSlowest imports made by app (cumulative, top {args.top})")
+    for name, seconds in sorted(report['modules'].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40} {seconds * 1000:>8.1f} ms")
+
+    print("\nData preparation (init_data)")
+    for step, seconds in report['steps'].items():
+        print(f"  {step:<40} {seconds * 1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
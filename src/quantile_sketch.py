@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Mergeable KLL quantile sketches, kept per cube cell.
+
+A ``KLLSketch`` summarises a stream of numbers in ``O(k)`` memory and answers
+quantile queries with a rank error of roughly ``1.7 / k``. Sketches of
+disjoint row sets can be merged, so ``QuantileCube`` keeps one sketch per
+(country, industry, gender, ...) cell and merges the cells matching a filter
+on demand instead of sorting the filtered rows on every click.
+"""
+
+import numpy as np
+
+# Default accuracy; larger k -> smaller rank error, more memory
+DEFAULT_K = 200
+
+_EMPTY = np.empty(0)
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty, 2016) over float values."""
+
+    def __init__(self, k=DEFAULT_K, rng=None, c=2 / 3):
+        self.k = k
+        self.c = c
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.compactors = [_EMPTY]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(np.ceil(self.k * self.c ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append(_EMPTY)
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _size(self):
+        return sum(len(items) for items in self.compactors)
+
+    def _compress(self):
+        while self._size() >= self._max_size:
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    break
+            if level + 1 >= len(self.compactors):
+                self._grow()
+            # Sort, keep the odd item out, promote every other item one level up
+            items = np.sort(items)
+            keep, items = items[:len(items) % 2], items[len(items) % 2:]
+            promoted = items[self.rng.integers(2)::2]
+            self.compactors[level] = keep
+            self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+
+    def update(self, values):
+        """Add values to the sketch; NaNs are ignored."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Merge ``other`` into this sketch in place."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def copy(self):
+        sketch = KLLSketch(self.k, self.rng, self.c)
+        sketch.compactors = list(self.compactors)
+        sketch.count, sketch.min, sketch.max = self.count, self.min, self.max
+        sketch._max_size = self._max_size
+        return sketch
+
+    def quantiles(self, qs):
+        """Approximate values at the quantiles ``qs`` (each in [0, 1])."""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        values = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level)
+                                  for level, items in enumerate(self.compactors)])
+        order = np.argsort(values, kind='stable')
+        values, cum_weights = values[order], np.cumsum(weights[order])
+        idx = np.searchsorted(cum_weights, qs * cum_weights[-1], side='left')
+        result = values[np.clip(idx, 0, len(values) - 1)]
+        # Extremes are tracked exactly
+        result = np.where(qs <= 0, self.min, result)
+        return np.where(qs >= 1, self.max, result)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+
+class QuantileCube:
+    """One ``KLLSketch`` per metric per combination of ``dims`` values."""
+
+    def __init__(self, dims, metrics, k=DEFAULT_K, seed=0):
+        self.dims = list(dims)
+        self.metrics = list(metrics)
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.cells = {}
+
+    def update(self, frame):
+        """Ingest a batch of rows (a DataFrame with ``dims`` and ``metrics`` columns)."""
+        for key, group in frame.groupby(self.dims, dropna=False, sort=False):
+            key = key if isinstance(key, tuple) else (key,)
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = {m: KLLSketch(self.k, self.rng) for m in self.metrics}
+            for metric in self.metrics:
+                cell[metric].update(group[metric].to_numpy())
+        return self
+
+    def query(self, filters=None, group_by=None):
+        """Merge the cells matching ``filters`` into one sketch per ``group_by`` value.
+
+        ``filters`` maps a dim to the allowed values (empty or missing means
+        no filter). Returns ``{group value: {metric: KLLSketch}}``; the single
+        key is None when ``group_by`` is not given.
+        """
+        allowed = [(self.dims.index(dim), set(values))
+                   for dim, values in (filters or {}).items() if values]
+        group_pos = self.dims.index(group_by) if group_by is not None else None
+
+        merged = {}
+        for key, cell in self.cells.items():
+            if any(key[pos] not in values for pos, values in allowed):
+                continue
+            group = key[group_pos] if group_pos is not None else None
+            if group not in merged:
+                merged[group] = {m: sketch.copy() for m, sketch in cell.items()}
+            else:
+                for metric, sketch in cell.items():
+                    merged[group][metric].merge(sketch)
+        return merged
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Shared cross-filter selection for the dashboard.
+
+The selection lives in a ``dcc.Store`` as a small dict:
+
+    {'country': [12], 'citizenship': [], 'industries': [3, 7], 'rows': 'eJzt...'}
+
+Category dimensions hold integer codes into the sorted category lists built
+once at load, and ``rows`` holds a zlib-compressed, base64-encoded bitset of
+dataset rows (e.g. from a lasso on the scatter). An empty or missing entry
+means "no filter" on that dimension.
+"""
+
+import base64
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+# Selection dimension -> dataframe column
+DIMENSIONS = {
+    'country': 'country',                   # ISO code of residence (map clicks)
+    'citizenship': 'countryOfCitizenship',  # Country dropdown
+    'industries': 'industries',             # Industry dropdown and pie clicks
+}
+
+EMPTY_SELECTION = {'country': [], 'citizenship': [], 'industries': [], 'rows': None}
+
+
+def encode_rows(mask):
+    """Pack a boolean row mask into a compressed base64 bitset."""
+    packed = np.packbits(np.asarray(mask, dtype=bool))
+    return base64.b64encode(zlib.compress(packed.tobytes())).decode('ascii')
+
+
+def decode_rows(bitset, n_rows):
+    """Unpack a bitset produced by ``encode_rows`` into a boolean mask."""
+    # The bitset comes from the client: never inflate more than n_rows bits
+    data = zlib.decompressobj().decompress(base64.b64decode(bitset), max_length=(n_rows + 7) // 8)
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return np.unpackbits(packed, count=n_rows).astype(bool)
+
+
+class SelectionIndex:
+    """Per-category row bitmasks used to resolve a selection to rows.
+
+    Masks for every category value are computed once, so resolving a
+    selection is a handful of OR/AND operations over boolean arrays rather
+    than a fresh ``isin`` filter of the dataframe per chart.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.categories = {}
+        self._masks = {}
+        for dim, column in DIMENSIONS.items():
+            codes, uniques = _factorize(df[column].to_numpy())
+            self.categories[dim] = uniques
+            self._masks[dim] = codes[None, :] == np.arange(len(uniques))[:, None]
+        self._lookup = {dim: {value: code for code, value in enumerate(values)}
+                        for dim, values in self.categories.items()}
+        self._all_rows = np.ones(self.n_rows, dtype=bool)
+        self._all_rows.flags.writeable = False
+        # Per instance, so the cache does not keep old indexes alive
+        self._cached_mask = lru_cache(maxsize=256)(self._compute_mask)
+
+    def codes(self, dim, values):
+        """Map category values to their codes, dropping unknown values."""
+        lookup = self._lookup[dim]
+        return sorted(lookup[v] for v in values or [] if v in lookup)
+
+    def values(self, dim, codes):
+        """Map codes back to category values, dropping unknown codes."""
+        return [self.categories[dim][c] for c in self._valid_codes(dim, codes)]
+
+    def mask(self, selection, exclude=()):
+        """Boolean row mask for ``selection``, ignoring dimensions in ``exclude``.
+
+        Charts exclude the dimension they select on themselves, so e.g. the
+        scatter keeps showing every point while highlighting the lasso.
+        """
+        selection = selection or {}
+        key = tuple(
+            None if dim in exclude else self._valid_codes(dim, selection.get(dim))
+            for dim in DIMENSIONS
+        )
+        rows = selection.get('rows')
+        key += (rows if 'rows' not in exclude and isinstance(rows, str) else None,)
+        return self._cached_mask(key)
+
+    def _valid_codes(self, dim, codes):
+        # The selection comes from the client: drop codes that are not categories
+        n_categories = len(self.categories[dim])
+        if not isinstance(codes, (list, tuple)):
+            return ()
+        return tuple(c for c in codes if isinstance(c, int) and 0 <= c < n_categories)
+
+    def _compute_mask(self, key):
+        mask = self._all_rows
+        for dim, codes in zip(DIMENSIONS, key):
+            if codes:
+                mask = mask & self._masks[dim][list(codes)].any(axis=0)
+        rows = key[-1]
+        if rows:
+            mask = mask & decode_rows(rows, self.n_rows)
+        if mask is not self._all_rows:
+            mask.flags.writeable = False
+        return mask
+
+
+def _factorize(values):
+    """Codes into the sorted unique non-null values; nulls get -1."""
+    present = np.array([v == v and v is not None for v in values], dtype=bool)
+    uniques = sorted(set(values[present]))
+    lookup = {v: i for i, v in enumerate(uniques)}
+    codes = np.fromiter((lookup[v] if ok else -1 for v, ok in zip(values, present)),
+                        dtype=np.int32, count=len(values))
+    return codes, uniques